@@ -1,7 +1,14 @@
 import requests
 import json
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+# Serialização JSON rápida (opcional); cai para json da stdlib se ausente
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # ===== NOVO: Import do sistema de prompts otimizado =====
 try:
@@ -40,6 +47,31 @@ class AbacusClient:
             self.max_tokens = 4096
         # Caminho opcional para um prompt de sistema externo
         self.system_prompt_path = os.getenv("SYSTEM_PROMPT_PATH", "")
+        # Conteúdo do prompt externo em cache: (mtime, texto)
+        self._system_prompt_cache: Optional[Tuple[float, str]] = None
+    
+    def _read_system_prompt_file(self) -> Optional[str]:
+        """
+        Lê o prompt de sistema externo, relendo o arquivo só quando o mtime muda.
+        
+        Returns:
+            Optional[str]: Conteúdo do arquivo ou None se ausente/ilegível
+        """
+        if not self.system_prompt_path:
+            return None
+        try:
+            mtime = os.stat(self.system_prompt_path).st_mtime
+        except OSError:
+            return None
+        if self._system_prompt_cache and self._system_prompt_cache[0] == mtime:
+            return self._system_prompt_cache[1]
+        try:
+            with open(self.system_prompt_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except Exception:
+            return None
+        self._system_prompt_cache = (mtime, text)
+        return text
     
     def send_message(self, message: str, conversation_history: Optional[list] = None) -> Dict[str, Any]:
         """
@@ -62,12 +94,9 @@ class AbacusClient:
                 system_text = get_system_prompt(use_v2=use_v2)
             
             # 2. Permite override via arquivo externo (se especificado)
-            if self.system_prompt_path and os.path.isfile(self.system_prompt_path):
-                try:
-                    with open(self.system_prompt_path, "r", encoding="utf-8") as f:
-                        system_text = f.read()
-                except Exception:
-                    pass
+            file_text = self._read_system_prompt_file()
+            if file_text is not None:
+                system_text = file_text
             
             # 3. Fallback para prompt básico
             if not system_text:
@@ -121,7 +150,7 @@ class AbacusClient:
             response = requests.post(
                 url_with_key,
                 headers=self.headers,
-                data=json.dumps(payload),
+                data=orjson.dumps(payload) if HAS_ORJSON else json.dumps(payload),
                 timeout=600  # 10 MINUTOS - máximo possível para não dar timeout
             )
             
@@ -129,7 +158,7 @@ class AbacusClient:
             response.raise_for_status()
             
             # Retorna a resposta parseada (formato Gemini)
-            response_data = response.json()
+            response_data = orjson.loads(response.content) if HAS_ORJSON else response.json()
             
             # Extrai o texto da resposta
             # Formato: {candidates: [{content: {parts: [{text: "..."}]}}]}
@@ -33,12 +33,14 @@ class CacheManager:
     
     def get_data_hash(self, cache: Dict[str, pd.DataFrame]) -> str:
         """
-        Gera hash MD5 do cache atual.
+        Gera hash MD5 do cache atual (o conteúdo de cada aba entra como um
+        resumo BLAKE2b dos hashes de linha do pandas).
         
         O hash é baseado em:
         - Chaves do cache (sheet_id::ws_title)
         - Shape de cada DataFrame (linhas, colunas)
         - Nomes das colunas
+        - Conteúdo completo (hash vetorizado por linha via pandas + BLAKE2b)
         
         Args:
             cache: Dict com DataFrames do SheetsLoader
@@ -53,8 +55,12 @@ class CacheManager:
         if not cache:  # Dict vazio
             return hashlib.md5(b"empty_cache").hexdigest()
         
-        # Concatena informações estruturais de todos os DataFrames
-        signature = []
+        # Alimenta o hash incrementalmente (sem montar a assinatura inteira em memória),
+        # com os mesmos bytes de "||".join(assinaturas). A assinatura de conteúdo
+        # (hash_pandas_object + BLAKE2b) difere da versão anterior: hashes gravados
+        # antes dela não batem e provocam uma reindexação completa, uma única vez.
+        hasher = hashlib.md5()
+        n_signatures = 0
         
         for key, df in sorted(cache.items()):
             # Proteção contra None no DataFrame
@@ -68,26 +74,27 @@ class CacheManager:
                 f"columns:{','.join(df.columns)}"
             ]
             
-            # Opcional: incluir hash das primeiras/últimas linhas
-            # (detecta mudanças no conteúdo, não só estrutura)
+            # Hash do conteúdo (detecta mudanças no conteúdo, não só estrutura).
+            # hash_pandas_object roda em C sobre todas as linhas; o BLAKE2b
+            # consome o buffer de uint64 direto, sem serializar para CSV.
             if not df.empty:
                 try:
-                    # Hash das primeiras 5 e últimas 5 linhas
-                    head = df.head(5).to_csv(index=False)
-                    tail = df.tail(5).to_csv(index=False)
-                    sig_parts.append(f"content:{hashlib.md5((head+tail).encode()).hexdigest()[:8]}")
+                    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+                    content = hashlib.blake2b(row_hashes.tobytes(), digest_size=4)
+                    sig_parts.append(f"content:{content.hexdigest()}")
                 except Exception:
                     pass
             
-            signature.append("|".join(sig_parts))
+            if n_signatures:
+                hasher.update(b"||")
+            hasher.update("|".join(sig_parts).encode())
+            n_signatures += 1
         
         # Proteção contra signature vazia
-        if not signature:
+        if not n_signatures:
             return hashlib.md5(b"empty_cache").hexdigest()
         
-        # Combina tudo e gera hash
-        combined = "||".join(signature)
-        return hashlib.md5(combined.encode()).hexdigest()
+        return hasher.hexdigest()
     
     def needs_reindex(self, current_hash: str) -> bool:
         """
@@ -8,11 +8,16 @@ Ordem de prioridade para ler configurações:
 
 Também expõe utilitários para criar as credenciais da Service Account e
 construir os serviços da Google API (Drive e Sheets).
+
+As leituras de configuração e as credenciais são memoizadas por processo (os
+getters são chamados a cada rerun do Streamlit); use reset_settings_cache() para
+forçar releitura.
 """
 from __future__ import annotations
 
 import os
 import json
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
@@ -55,9 +60,11 @@ def _secrets_get(path: Tuple[str, ...]) -> Optional[Any]:
         return None
 
 
+@lru_cache(maxsize=64)
 def get_str_setting(*names: str, default: Optional[str] = None) -> Optional[str]:
     """Lê string de configuração por prioridade: st.secrets -> os.environ.
     Observa tanto raiz quanto seções conhecidas nos secrets.
+    Resultado memoizado por (names, default); ver reset_settings_cache().
     """
     # 1) st.secrets (raiz)
     for name in names:
@@ -86,39 +93,62 @@ def get_str_setting(*names: str, default: Optional[str] = None) -> Optional[str]
     return default
 
 
-def get_list_setting(*names: str) -> List[str]:
-    """Lê lista de strings; aceita lista no secrets ou CSV como string."""
+def get_list_setting(*names: str) -> Tuple[str, ...]:
+    """Lê lista de strings; aceita lista no secrets ou CSV como string.
+    Retorna tupla imutável (compartilhada pelo cache).
+    """
+    return _get_list_setting_cached(names)
+
+
+def _split_csv(csv: str) -> Tuple[str, ...]:
+    return tuple(p for part in csv.split(",") if (p := part.strip()))
+
+
+def _clean_list(values: List[Any]) -> Tuple[str, ...]:
+    return tuple(p for x in values if (p := str(x).strip()))
+
+
+@lru_cache(maxsize=16)
+def _get_list_setting_cached(names: Tuple[str, ...]) -> Tuple[str, ...]:
     # secrets raiz
     for name in names:
         val = _secrets_get((name,))
         if isinstance(val, list):
-            return [str(x).strip() for x in val if str(x).strip()]
+            return _clean_list(val)
         if val is not None:
             csv = str(val).strip()
             if csv:
-                return [x.strip() for x in csv.split(",") if x.strip()]
+                return _split_csv(csv)
     # secrets em seções
     sections = ("sheets", "google_sheets", "google_service_account")
     for name in names:
         for sect in sections:
             val = _secrets_get((sect, name))
             if isinstance(val, list):
-                return [str(x).strip() for x in val if str(x).strip()]
+                return _clean_list(val)
             if val is not None:
                 csv = str(val).strip()
                 if csv:
-                    return [x.strip() for x in csv.split(",") if x.strip()]
+                    return _split_csv(csv)
     # env
     for name in names:
         csv = os.getenv(name, "").strip()
         if csv:
-            return [x.strip() for x in csv.split(",") if x.strip()]
-    return []
+            return _split_csv(csv)
+    return ()
+
+
+def reset_settings_cache() -> None:
+    """Descarta as configurações memoizadas (útil em testes ou após alterar secrets/env)."""
+    get_str_setting.cache_clear()
+    _get_list_setting_cached.cache_clear()
+    get_google_service_account_credentials.cache_clear()
 
 
 # -------------------- Credenciais --------------------
+@lru_cache(maxsize=1)
 def get_google_service_account_credentials() -> Credentials:
-    """Cria Credentials da Service Account.
+    """Cria Credentials da Service Account (memoizado; falhas não ficam em cache).
 
     Prioridade:
     - GOOGLE_SERVICE_ACCOUNT_CREDENTIALS (JSON como string) em secrets/env
@@ -163,7 +193,10 @@ def get_google_service_account_credentials() -> Credentials:
 
 
 def get_google_apis_services():
-    """Retorna (drive_service, sheets_service) construídos com as credenciais."""
+    """
+    Retorna (drive_service, sheets_service) construídos com as credenciais.
+    Não é memoizado: os serviços usam httplib2, que não é thread-safe.
+    """
     creds = get_google_service_account_credentials()
     drive = build("drive", "v3", credentials=creds, cache_discovery=False)
     sheets = build("sheets", "v4", credentials=creds, cache_discovery=False)
@@ -175,7 +208,7 @@ def get_sheets_folder_id() -> Optional[str]:
     return get_str_setting("SHEETS_FOLDER_ID")
 
 
-def get_sheets_ids() -> List[str]:
+def get_sheets_ids() -> Tuple[str, ...]:
     return get_list_setting("SHEETS_IDS")
 
 
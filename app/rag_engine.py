@@ -2,10 +2,13 @@
 RAG Engine para Quasar Analytics
 Implementa Retrieval-Augmented Generation usando ChromaDB
 """
+import io
 import os
+import hashlib
 import pandas as pd
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 try:
     import chromadb
@@ -23,6 +26,138 @@ except ImportError:
     print("⚠️ sentence-transformers não instalado. Execute: pip install sentence-transformers")
 
 
+# Colunas priorizadas no texto semântico
+PRIORITY_COLS = ["Data", "Produto", "Categoria", "Região", "Quantidade", "Receita_Total"]
+# Colunas copiadas para os metadados (filtros)
+METADATA_COLS = ["Data", "Produto", "Categoria", "Região", "ID_Transação"]
+
+# Coleção com índice HNSW em espaço cosseno (relevância = 1 - distância)
+COLLECTION_NAME = "vendas"
+COLLECTION_METADATA = {
+    "description": "Dados de vendas do Quasar Analytics",
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+}
+
+# Máximo de embeddings de consulta mantidos em memória (LRU)
+QUERY_CACHE_SIZE = 2048
+
+
+def _escape_fmt(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _priority_format(col_names: List[str], priority_idx: List[int], ws_title: str) -> str:
+    """Format string pré-compilado do trecho fixo (aba + colunas prioritárias) de uma aba."""
+    parts = [f"Aba: {_escape_fmt(ws_title)}"]
+    parts += [f"{_escape_fmt(col_names[i])}: {{}}" for i in priority_idx]
+    return " | ".join(parts)
+
+
+def _row_to_text(
+    columns: Dict[int, List[str]],
+    pos: int,
+    col_names: List[str],
+    priority_idx: List[int],
+    other_idx: List[int],
+    ws_title: str,
+    priority_fmt: str
+) -> str:
+    """
+    Converte uma linha em texto semântico otimizado para busca.
+    
+    Args:
+        columns: Colunas já convertidas para texto, por posição ("" para vazias/NaN)
+        pos: Posição da linha
+        col_names: Nomes das colunas
+        priority_idx: Posições das colunas prioritárias (na ordem de PRIORITY_COLS)
+        other_idx: Posições das demais colunas (exceto internas "_*")
+        ws_title: Título da worksheet
+        priority_fmt: Format string de _priority_format() para a aba
+        
+    Returns:
+        str: Texto formatado para embedding
+    """
+    # Prioriza colunas importantes: caso comum (todas preenchidas) num único format
+    values = [columns[i][pos] for i in priority_idx]
+    if all(v.strip() for v in values):
+        parts = [priority_fmt.format(*values)]
+    else:
+        parts = [f"Aba: {ws_title}"]
+        parts += [f"{col_names[i]}: {v}" for i, v in zip(priority_idx, values) if v.strip()]
+    
+    # Adiciona outras colunas
+    parts += [f"{col_names[i]}: {v}" for i in other_idx if (v := columns[i][pos]).strip()]
+    return " | ".join(parts)
+
+
+def _prepare_sheet(
+    item: Tuple[str, pd.DataFrame]
+) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+    """Monta (textos, metadados, ids) de uma aba."""
+    key, df = item
+    sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
+    docs: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    ids: List[str] = []
+    
+    col_names = [str(c) for c in df.columns]
+    first_pos: Dict[str, int] = {}
+    for i, name in enumerate(col_names):
+        first_pos.setdefault(name, i)
+    priority_idx = [first_pos[c] for c in PRIORITY_COLS if c in first_pos]
+    other_idx = [
+        i for i, c in enumerate(col_names)
+        if c not in PRIORITY_COLS and not c.startswith("_")
+    ]
+    meta_idx = [(first_pos[c], c.lower()) for c in METADATA_COLS if c in first_pos]
+    priority_fmt = _priority_format(col_names, priority_idx, ws_title)
+    
+    # Layout colunar: converte cada coluna usada para texto numa única passada
+    # vetorizada ("" para NaN) e guarda uma lista por coluna
+    columns: Dict[int, List[str]] = {}
+    present: Dict[int, List[bool]] = {}
+    # quantas vezes cada texto já apareceu nesta aba (vendas idênticas)
+    occurrences: Dict[str, int] = {}
+    for i in dict.fromkeys(priority_idx + other_idx + [i for i, _ in meta_idx]):
+        col = df.iloc[:, i]
+        mask = col.notna()
+        columns[i] = col.astype(str).where(mask, "").tolist()
+        present[i] = mask.tolist()
+    
+    for pos, idx in enumerate(df.index):
+        # Texto semântico: combina colunas relevantes
+        text = _row_to_text(
+            columns, pos, col_names, priority_idx, other_idx, ws_title, priority_fmt
+        )
+        
+        # Metadados para filtros
+        metadata = {
+            "sheet_id": sheet_id,
+            "worksheet": ws_title,
+            "row_index": int(idx)
+        }
+        
+        # Adiciona colunas importantes aos metadados
+        for i, meta_key in meta_idx:
+            if present[i][pos]:
+                metadata[meta_key] = columns[i][pos]
+        
+        docs.append(text)
+        metadatas.append(metadata)
+        # ID derivado de aba + conteúdo + nº da ocorrência do texto na aba:
+        # independe da posição (inserir/remover linhas não muda o ID das demais,
+        # que não são re-embedadas) e vendas idênticas continuam distintas
+        n = occurrences.get(text, 0)
+        occurrences[text] = n + 1
+        ids.append(
+            hashlib.blake2b(f"{key}\x1f{text}\x1f{n}".encode("utf-8"), digest_size=12).hexdigest()
+        )
+    
+    return docs, metadatas, ids
+
+
 class RAGEngine:
     """
     Motor de Retrieval-Augmented Generation para o Quasar.
@@ -55,12 +190,11 @@ class RAGEngine:
         # Cria diretório se não existir
         Path(persist_dir).mkdir(parents=True, exist_ok=True)
         
-        # Cliente ChromaDB com persistência
-        self.client = chromadb.Client(Settings(
-            chroma_db_impl="duckdb+parquet",
-            persist_directory=persist_dir,
-            anonymized_telemetry=False
-        ))
+        # Cliente ChromaDB com persistência (índice HNSW; grava em disco automaticamente)
+        self.client = chromadb.PersistentClient(
+            path=persist_dir,
+            settings=Settings(anonymized_telemetry=False)
+        )
         
         # Modelo de embeddings
         print(f"🔄 Carregando modelo de embeddings: {embedding_model}")
@@ -69,11 +203,16 @@ class RAGEngine:
         
         # Coleção de vendas
         self.collection = self.client.get_or_create_collection(
-            name="vendas",
-            metadata={"description": "Dados de vendas do Quasar Analytics"}
+            name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA
         )
         
         self.persist_dir = persist_dir
+        
+        # Cache LRU de embeddings de consulta (chave: query normalizada)
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_cache_hits = 0
+        self._query_cache_misses = 0
     
     def index_dataframes(
         self,
@@ -83,6 +222,9 @@ class RAGEngine:
         """
         Indexa todos os DataFrames do cache em ChromaDB.
         
+        O cache deve ser o conjunto completo de abas: documentos que não
+        correspondem a nenhuma linha atual são removidos da coleção.
+        
         Args:
             cache: Dict com chave "sheet_id::ws_title" e valor DataFrame
             batch_size: Tamanho do batch para inserção (evita estouro de memória)
@@ -91,110 +233,98 @@ class RAGEngine:
             int: Número de documentos indexados
         """
         indexed = 0
+        embedded = 0
         batch_docs = []
-        batch_embeddings = []
         batch_metadatas = []
         batch_ids = []
+        seen_ids = set()
         
         print(f"🔄 Indexando {len(cache)} planilhas...")
         
-        for key, df in cache.items():
-            if df.empty:
-                continue
-            
-            sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
-            
-            for idx, row in df.iterrows():
-                # Texto semântico: combina colunas relevantes
-                text = self._row_to_text(row, ws_title)
-                
-                # Metadados para filtros
-                metadata = {
-                    "sheet_id": sheet_id,
-                    "worksheet": ws_title,
-                    "row_index": int(idx)
-                }
-                
-                # Adiciona colunas importantes aos metadados
-                for col in ["Data", "Produto", "Categoria", "Região", "ID_Transação"]:
-                    if col in row and pd.notna(row[col]):
-                        metadata[col.lower()] = str(row[col])
-                
-                # ID único
-                doc_id = f"{key}::{idx}"
+        items = [(key, df) for key, df in cache.items() if not df.empty]
+        
+        for docs, metadatas, ids in [_prepare_sheet(item) for item in items]:
+            for text, metadata, doc_id in zip(docs, metadatas, ids):
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
                 
                 # Adiciona ao batch
                 batch_docs.append(text)
                 batch_metadatas.append(metadata)
                 batch_ids.append(doc_id)
                 
-                # Gera embedding (processamento em batch é mais eficiente)
                 if len(batch_docs) >= batch_size:
-                    # Embeddings em batch
-                    batch_embeddings = self.embedder.encode(batch_docs).tolist()
-                    
-                    # Adiciona ao ChromaDB
-                    self.collection.add(
-                        documents=batch_docs,
-                        embeddings=batch_embeddings,
-                        metadatas=batch_metadatas,
-                        ids=batch_ids
-                    )
-                    
+                    embedded += self._upsert_batch(batch_docs, batch_metadatas, batch_ids)
                     indexed += len(batch_docs)
                     print(f"  ✅ {indexed} documentos indexados...")
                     
                     # Limpa batch
                     batch_docs = []
-                    batch_embeddings = []
                     batch_metadatas = []
                     batch_ids = []
         
         # Processa batch final
         if batch_docs:
-            batch_embeddings = self.embedder.encode(batch_docs).tolist()
-            self.collection.add(
-                documents=batch_docs,
-                embeddings=batch_embeddings,
-                metadatas=batch_metadatas,
-                ids=batch_ids
-            )
+            embedded += self._upsert_batch(batch_docs, batch_metadatas, batch_ids)
             indexed += len(batch_docs)
         
-        # Persiste no disco
-        self.client.persist()
-        print(f"✅ Total de {indexed} documentos indexados e salvos em {self.persist_dir}")
+        # Remove versões antigas de linhas editadas e linhas que sumiram das planilhas
+        removed = self._delete_stale(seen_ids, batch_size)
+        
+        print(
+            f"✅ Total de {indexed} documentos indexados ({embedded} novos embeddings, "
+            f"{removed} removidos) e salvos em {self.persist_dir}"
+        )
         
         return indexed
     
-    def _row_to_text(self, row: pd.Series, ws_title: str) -> str:
+    def _upsert_batch(
+        self,
+        docs: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> int:
         """
-        Converte uma linha do DataFrame em texto semântico otimizado para busca.
+        Gera embeddings e grava somente os documentos ainda ausentes na coleção;
+        os já existentes só têm os metadados atualizados (row_index pode ter mudado).
         
-        Args:
-            row: Linha do DataFrame
-            ws_title: Título da worksheet
-            
         Returns:
-            str: Texto formatado para embedding
+            int: Número de documentos efetivamente embedados
         """
-        parts = [f"Aba: {ws_title}"]
-        
-        # Prioriza colunas importantes
-        priority_cols = ["Data", "Produto", "Categoria", "Região", "Quantidade", "Receita_Total"]
-        
-        for col in priority_cols:
-            if col in row and pd.notna(row[col]) and str(row[col]).strip():
-                parts.append(f"{col}: {row[col]}")
+        existing = set(self.collection.get(ids=ids, include=[])["ids"])
+        new_idx = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+        kept_idx = [i for i, doc_id in enumerate(ids) if doc_id in existing]
+        if kept_idx:
+            self.collection.update(
+                ids=[ids[i] for i in kept_idx],
+                metadatas=[metadatas[i] for i in kept_idx]
+            )
+        if not new_idx:
+            return 0
         
-        # Adiciona outras colunas
-        for col, val in row.items():
-            if col in priority_cols or col.startswith("_"):
-                continue
-            if pd.notna(val) and str(val).strip():
-                parts.append(f"{col}: {val}")
+        new_docs = [docs[i] for i in new_idx]
+        # Embeddings em batch (processamento em batch é mais eficiente)
+        embeddings = self.embedder.encode(new_docs).tolist()
+        self.collection.upsert(
+            documents=new_docs,
+            embeddings=embeddings,
+            metadatas=[metadatas[i] for i in new_idx],
+            ids=[ids[i] for i in new_idx]
+        )
+        return len(new_idx)
+    
+    def _delete_stale(self, keep_ids: set, batch_size: int = 100) -> int:
+        """
+        Apaga da coleção os documentos cujo ID não foi gerado nesta indexação.
         
-        return " | ".join(parts)
+        Returns:
+            int: Número de documentos removidos
+        """
+        stale = [doc_id for doc_id in self.collection.get(include=[])["ids"] if doc_id not in keep_ids]
+        for start in range(0, len(stale), batch_size):
+            self.collection.delete(ids=stale[start:start + batch_size])
+        return len(stale)
     
     def search(
         self,
@@ -213,8 +343,8 @@ class RAGEngine:
         Returns:
             List[Dict]: Lista de resultados com texto, metadados e distância
         """
-        # Gera embedding da query
-        query_embedding = self.embedder.encode(query).tolist()
+        # Gera embedding da query (reaproveita se a pergunta já foi vista)
+        query_embedding = self._encode_query(query)
         
         # Busca no ChromaDB
         results = self.collection.query(
@@ -235,6 +365,22 @@ class RAGEngine:
         
         return formatted
     
+    def _encode_query(self, query: str) -> List[float]:
+        """Embedding da consulta com cache LRU sobre o texto normalizado."""
+        key = " ".join(query.lower().split())
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            self._query_cache_hits += 1
+            return cached
+        
+        self._query_cache_misses += 1
+        embedding = self.embedder.encode(key).tolist()
+        self._query_cache[key] = embedding
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return embedding
+    
     def build_context(
         self,
         results: List[Dict[str, Any]],
@@ -253,10 +399,11 @@ class RAGEngine:
         if not results:
             return "[sem contexto disponível]"
         
-        lines = []
+        # Acumula em um único buffer (sem lista intermediária + join)
+        buf = io.StringIO()
         total_chars = 0
         
-        for r in results:
+        for n, r in enumerate(results):
             line = f"• {r['text']}"
             
             # Adiciona distância se disponível (menor = mais similar)
@@ -265,16 +412,18 @@ class RAGEngine:
                 line += f" (relevância: {similarity:.2%})"
             
             line_chars = len(line)
+            sep = "\n" if n else ""
             
             # Verifica se cabe no limite
             if total_chars + line_chars > max_chars:
-                lines.append(f"... (mais {len(results) - len(lines)} resultados omitidos por limite de tokens)")
+                buf.write(f"{sep}... (mais {len(results) - n} resultados omitidos por limite de tokens)")
                 break
             
-            lines.append(line)
+            buf.write(sep)
+            buf.write(line)
             total_chars += line_chars
         
-        return "\n".join(lines)
+        return buf.getvalue()
     
     def clear(self):
         """Limpa o índice (útil para reindexação completa)."""
@@ -285,26 +434,25 @@ class RAGEngine:
             if not hasattr(self, 'collection') or self.collection is None:
                 print("⚠️ Collection não existe, criando nova...")
                 self.collection = self.client.get_or_create_collection(
-                    name="vendas",
-                    metadata={"description": "Dados de vendas do Quasar Analytics"}
+                    name=COLLECTION_NAME,
+                    metadata=COLLECTION_METADATA
                 )
                 return
             
             # Deleta e recria collection
-            self.client.delete_collection("vendas")
+            self.client.delete_collection(COLLECTION_NAME)
             self.collection = self.client.get_or_create_collection(
-                name="vendas",
-                metadata={"description": "Dados de vendas do Quasar Analytics"}
+                name=COLLECTION_NAME,
+                metadata=COLLECTION_METADATA
             )
-            self.client.persist()
             print("✅ Índice limpo")
         except Exception as e:
             print(f"⚠️ Erro ao limpar índice: {e}")
             # Tenta recriar collection mesmo com erro
             try:
                 self.collection = self.client.get_or_create_collection(
-                    name="vendas",
-                    metadata={"description": "Dados de vendas do Quasar Analytics"}
+                    name=COLLECTION_NAME,
+                    metadata=COLLECTION_METADATA
                 )
             except Exception:
                 pass
@@ -312,11 +460,18 @@ class RAGEngine:
     def stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do índice."""
         count = self.collection.count()
+        lookups = self._query_cache_hits + self._query_cache_misses
         return {
             "total_documents": count,
             "persist_directory": self.persist_dir,
             "embedding_model": self.embedder.get_sentence_embedding_dimension(),
-            "collection_name": self.collection.name
+            "collection_name": self.collection.name,
+            "query_cache": {
+                "size": len(self._query_cache),
+                "hits": self._query_cache_hits,
+                "misses": self._query_cache_misses,
+                "hit_rate": (self._query_cache_hits / lookups) if lookups else 0.0
+            }
         }
 
 
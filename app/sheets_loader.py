@@ -1,12 +1,36 @@
 # app/sheets_loader.py
 
+import hashlib
+import io
+import json
 import os
 import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from googleapiclient.discovery import build
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import pyarrow  # noqa: F401  (engine do to_parquet/read_parquet)
+    HAS_PYARROW = True
+    _PYARROW_IMPORT_ERROR = ""
+except ImportError as _e:
+    # também cobre pyarrow instalado mas incompatível com o numpy fixado
+    HAS_PYARROW = False
+    _PYARROW_IMPORT_ERROR = str(_e)
+
 from app.config import (
     get_google_service_account_credentials,
     get_sheets_folder_id,
@@ -14,6 +38,95 @@ from app.config import (
     get_sheet_range,
 )
 
+# downloads simultâneos de planilhas em load_all
+SHEETS_MAX_WORKERS = 8
+# novas tentativas (backoff exponencial do googleapiclient) em erros 429/5xx
+SHEETS_NUM_RETRIES = 3
+# limite de requisições por batch HTTP do Drive
+DRIVE_BATCH_SIZE = 100
+# versão do formato do cache em Parquet (incrementar ao mudar como os frames são montados)
+DISK_CACHE_FORMAT = 2
+# idade (s) a partir da qual um diretório temporário de gravação é considerado abandonado
+DISK_CACHE_TMP_MAX_AGE = 3600
+
+
+# pool de downloads único no processo: compartilhado por todos os loaders (sessões),
+# limita o total de threads/conexões e é reaproveitado entre chamadas de load_all
+_DOWNLOAD_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_DOWNLOAD_EXECUTOR_LOCK = threading.Lock()
+
+
+def _download_executor() -> ThreadPoolExecutor:
+    """Pool de threads de download, criado sob demanda."""
+    global _DOWNLOAD_EXECUTOR
+    with _DOWNLOAD_EXECUTOR_LOCK:
+        if _DOWNLOAD_EXECUTOR is None:
+            _DOWNLOAD_EXECUTOR = ThreadPoolExecutor(
+                max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets-load"
+            )
+        return _DOWNLOAD_EXECUTOR
+
+
+def _dump_record(record: Dict[str, Any]) -> str:
+    """Serializa um registro em JSON compacto (orjson quando disponível)."""
+    if HAS_ORJSON:
+        return orjson.dumps(record, default=str).decode("utf-8")
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+# meses em português
+MONTH_NAMES: Dict[str, str] = {
+    "01": "janeiro", "02": "fevereiro", "03": "março", "04": "abril",
+    "05": "maio", "06": "junho", "07": "julho", "08": "agosto",
+    "09": "setembro", "10": "outubro", "11": "novembro", "12": "dezembro",
+}
+# nome -> número (aceita "marco" sem cedilha)
+MONTH_NUMBERS: Dict[str, str] = {
+    "janeiro": "01", "fevereiro": "02", "março": "03", "marco": "03",
+    "abril": "04", "maio": "05", "junho": "06", "julho": "07", "agosto": "08",
+    "setembro": "09", "outubro": "10", "novembro": "11", "dezembro": "12",
+}
+# números no formato brasileiro: "R$ 1.234,56" -> "1234.56" numa única passada
+_BR_NUMBER_TABLE = str.maketrans({".": "", ",": ".", "R": "", "$": "", " ": "", "\u00a0": ""})
+_NON_NUMERIC_RE = re.compile(r"[^0-9\.-]")
+
+# regexes usadas nos caminhos de consulta (compiladas uma vez)
+_ID_RE = re.compile(r"\b[A-Z]-(?:\d{6}|\d{4})-\d{3,6}\b")  # ex.: V-202403-001
+_PERIOD_RE = re.compile(r"_(20\d{2})_(\d{2})_")                # token _AAAA_MM_
+_KEY_YEAR_RE = re.compile(r"_(20\d{2})_")
+_YEAR_RE = re.compile(r"20\d{2}")
+_MONTH_NUM_RE = re.compile(r"\d{1,2}")
+_NON_ALNUM_RE = re.compile(r"[^0-9A-Za-z]")
+
+# formatos de data tentados em ordem antes da inferência (dd/mm/aaaa primeiro)
+_DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%Y %H:%M:%S", "%d/%m/%y")
+
+# nome do mês (nomes mais longos primeiro) ou ano 20xx, em uma só regex
+_MONTH_YEAR_RE = re.compile(
+    r"(?P<month>"
+    + "|".join(re.escape(n) for n in sorted(MONTH_NUMBERS, key=len, reverse=True))
+    + r")|\b(?P<year>20\d{2})\b"
+)
+# nomes e abreviações reconhecidos na pergunta do usuário
+MONTH_ALIASES: Dict[str, str] = {
+    "janeiro": "01", "jan": "01",
+    "fevereiro": "02", "fev": "02",
+    "março": "03", "marco": "03", "mar": "03",
+    "abril": "04", "abr": "04",
+    "maio": "05", "mai": "05",
+    "junho": "06", "jun": "06",
+    "julho": "07", "jul": "07",
+    "agosto": "08", "ago": "08",
+    "setembro": "09", "set": "09",
+    "outubro": "10", "out": "10",
+    "novembro": "11", "nov": "11",
+    "dezembro": "12", "dez": "12",
+}
+# um alias só conta como palavra inteira ("mai" não casa em "mais", nem "out" em "outros")
+_MONTH_ALIAS_RE = re.compile(
+    r"\b(" + "|".join(re.escape(n) for n in sorted(MONTH_ALIASES, key=len, reverse=True)) + r")\b"
+)
+
 
 class SheetsLoader:
     """
@@ -30,22 +143,46 @@ class SheetsLoader:
         creds_path: Optional[str] = None,         # mantido por compat, não usado
         sheet_ids: Optional[List[str]] = None,
         sheet_range: str = "A:Z",
+        disk_cache_dir: Optional[str] = "./data/cache/sheets",
     ) -> None:
         # IDs e range vêm do app.config
-        self.sheet_ids = sheet_ids or get_sheets_ids()
+        self.sheet_ids: List[str] = list(sheet_ids or get_sheets_ids())
         self.sheet_folder_id: str = get_sheets_folder_id() or ""
         self.sheet_range = get_sheet_range(sheet_range)
+        # abas em Parquet por (planilha, modifiedTime); None desativa
+        self.disk_cache_dir: Optional[str] = disk_cache_dir if HAS_PYARROW else None
 
         # clientes Google API
         self._sheets = None
         self._drive = None
+        self._creds = None
+        # clientes Sheets por thread (usados pelos downloads paralelos)
+        self._local = threading.local()
 
         # cache: chave "<sheet_id>::<worksheet_title>" -> DataFrame
         self._cache: Dict[str, pd.DataFrame] = {}
+        # modifiedTime (Drive) da versão de cada planilha presente no cache
+        self._modified_times: Dict[str, str] = {}
+        # total de linhas do cache atual (calculado em load_all)
+        self._total_rows: int = 0
+        # versão do cache (incrementada a cada troca de _cache) e concat memoizado
+        self._cache_version: int = 0
+        self._concat_cache: Tuple[int, pd.DataFrame] = (-1, pd.DataFrame())
+        self._period_cache: Tuple[int, Dict[Tuple[str, str], List[str]]] = (-1, {})
+        self._month_frames: Tuple[int, Dict[Tuple[str, str], pd.DataFrame]] = (-1, {})
+        self._monthly_totals: Tuple[int, pd.DataFrame] = (-1, pd.DataFrame())
+        # texto concatenado (minúsculo) de cada linha, por chave, para as buscas
+        self._blob_cache: Tuple[int, Dict[str, pd.Series]] = (-1, {})
+        # índice valor -> linhas das colunas de ID, por chave, para o match exato de IDs
+        self._id_cols_cache: Tuple[int, Dict[str, Dict[str, np.ndarray]]] = (-1, {})
 
         # diagnóstico
         self._auth_source: Optional[str] = None
         self._last_errors: List[str] = []
+        if disk_cache_dir and not HAS_PYARROW:
+            self._last_errors.append(
+                f"Disk cache disabled: pyarrow unavailable ({_PYARROW_IMPORT_ERROR or 'not installed'})"
+            )
 
     # -------------------- Autenticação --------------------
 
@@ -54,6 +191,8 @@ class SheetsLoader:
         try:
             creds = get_google_service_account_credentials()
             self._auth_source = "app.config:get_google_service_account_credentials"
+            self._creds = creds
+            self._local = threading.local()
         except Exception as e:
             self._last_errors.append(f"Credentials error: {e}")
             raise
@@ -61,6 +200,7 @@ class SheetsLoader:
         try:
             self._drive = build("drive", "v3", credentials=creds, cache_discovery=False)
             self._sheets = build("sheets", "v4", credentials=creds, cache_discovery=False)
+            self._local.sheets = self._sheets  # a thread que autenticou reutiliza o cliente
         except Exception as e:
             self._drive = None
             self._sheets = None
@@ -103,6 +243,7 @@ class SheetsLoader:
                                 "nextPageToken, files(id, name, mimeType, "
                                 "shortcutDetails(targetId, targetMimeType))"
                             ),
+                            pageSize=1000,  # máximo do Drive: menos páginas/round-trips
                             pageToken=page_token,
                             includeItemsFromAllDrives=True,
                             supportsAllDrives=True,
@@ -135,79 +276,275 @@ class SheetsLoader:
         ids = [i for i in ids if i]
         return list(dict.fromkeys(ids))
 
+    def _fetch_modified_times(self, sheet_ids: List[str]) -> Dict[str, str]:
+        """
+        Consulta o modifiedTime (Drive) de cada planilha, em requisições batch
+        (até DRIVE_BATCH_SIZE arquivos por chamada HTTP).
+        IDs que falharem ficam de fora do resultado (e serão recarregados).
+        """
+        out: Dict[str, str] = {}
+
+        def _on_meta(request_id: str, response: Dict[str, Any], exception: Exception) -> None:
+            if exception is not None:
+                self._last_errors.append(f"Drive metadata error ({request_id}): {exception}")
+                return
+            mt = (response or {}).get("modifiedTime")
+            if mt:
+                out[request_id] = mt
+
+        ids = list(dict.fromkeys(sheet_ids))
+        for start in range(0, len(ids), DRIVE_BATCH_SIZE):
+            chunk = ids[start:start + DRIVE_BATCH_SIZE]
+            batch = self._drive.new_batch_http_request(callback=_on_meta)
+            for sheet_id in chunk:
+                batch.add(
+                    self._drive.files().get(
+                        fileId=sheet_id, fields="id, modifiedTime", supportsAllDrives=True
+                    ),
+                    request_id=sheet_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                self._last_errors.append(f"Drive metadata batch error ({len(chunk)} ids): {e}")
+        return out
+
+    def _thread_sheets(self):
+        """Cliente Sheets da thread atual (httplib2 não é thread-safe)."""
+        client = getattr(self._local, "sheets", None)
+        if client is None:
+            client = build("sheets", "v4", credentials=self._creds, cache_discovery=False)
+            self._local.sheets = client
+        return client
+
+    @staticmethod
+    def _values_to_dataframe(values: List[List[Any]], ws_title: str) -> pd.DataFrame:
+        """Converte a matriz de valores de uma aba em DataFrame (1ª linha = cabeçalho)."""
+        if not values:
+            return pd.DataFrame()
+        header = values[0]
+        rows = values[1:] if len(values) > 1 else []
+        if all(isinstance(h, str) and len(h) <= 60 for h in header):
+            # a API omite células vazias no fim da linha: completa cada linha
+            # numa matriz de objetos pré-alocada (e corta o que passar do cabeçalho)
+            width = len(header)
+            if rows and all(len(row) == width for row in rows):
+                # caso comum (abas sem células vazias no fim): já é retangular
+                grid = np.array(rows, dtype=object)
+            else:
+                # já preenche com "": dispensa o fillna (uma passada a menos no frame)
+                grid = np.full((len(rows), width), "", dtype=object)
+                for i, row in enumerate(rows):
+                    n = min(len(row), width)
+                    grid[i, :n] = row[:n]
+            df = pd.DataFrame(grid, columns=header, copy=False)
+        else:
+            df = pd.DataFrame(values).fillna("")
+        if not df.empty:
+            # título constante na aba: categórico (1 código int8 por linha, não 1 str)
+            df["_ws_title"] = pd.Categorical.from_codes(
+                np.zeros(len(df), dtype=np.int8), categories=[ws_title]
+            )
+        return df
+
+    def _load_spreadsheet(self, sheet_id: str) -> Tuple[str, Dict[str, pd.DataFrame], bool]:
+        """
+        Baixa todas as abas de uma planilha: 1 chamada de metadados + 1 batchGet.
+        Roda em threads de load_all; retorna (sheet_id, {chave: DataFrame}, completa).
+        """
+        frames: Dict[str, pd.DataFrame] = {}
+        try:
+            sheets_api = self._thread_sheets().spreadsheets()
+            meta = (
+                sheets_api
+                .get(spreadsheetId=sheet_id, fields="sheets(properties(title,sheetType))")
+                .execute(num_retries=SHEETS_NUM_RETRIES)
+            )
+            titles = [
+                sh["properties"]["title"]
+                for sh in meta.get("sheets", [])
+                if sh.get("properties", {}).get("sheetType", "GRID") == "GRID"
+            ]
+            if not titles:
+                return sheet_id, frames, True
+
+            # títulos entre aspas simples (escapando ') para suportar espaços/acentos
+            ranges = ["'{}'!{}".format(t.replace("'", "''"), self.sheet_range) for t in titles]
+            resp = (
+                sheets_api.values()
+                .batchGet(spreadsheetId=sheet_id, ranges=ranges, fields="valueRanges(values)")
+                .execute(num_retries=SHEETS_NUM_RETRIES)
+            )
+            value_ranges = resp.get("valueRanges", [])
+            for ws_title, vr in zip(titles, value_ranges):
+                frames[f"{sheet_id}::{ws_title}"] = self._values_to_dataframe(
+                    vr.get("values", []), ws_title
+                )
+            complete = len(value_ranges) == len(titles)
+            if not complete:
+                self._last_errors.append(
+                    f"Worksheet read error ({sheet_id}): batchGet retornou "
+                    f"{len(value_ranges)} de {len(titles)} abas"
+                )
+            return sheet_id, frames, complete
+        except Exception as e:
+            self._last_errors.append(f"Spreadsheet open error ({sheet_id}): {e}")
+            return sheet_id, frames, False
+
+    # -------------------- Cache em disco --------------------
+
+    def _disk_cache_path(self, sheet_id: str, modified_time: str) -> Optional[Path]:
+        """
+        Diretório da versão de uma planilha no cache em disco: modifiedTime +
+        resumo do range lido e do formato do cache (trocar SHEET_RANGE invalida).
+        """
+        if not self.disk_cache_dir:
+            return None
+        variant = hashlib.blake2b(
+            f"{DISK_CACHE_FORMAT}|{self.sheet_range}".encode("utf-8"), digest_size=6
+        ).hexdigest()
+        version = _NON_ALNUM_RE.sub("", modified_time)
+        return Path(self.disk_cache_dir) / sheet_id / f"{version}-{variant}"
+
+    @staticmethod
+    def _parquet_safe(df: pd.DataFrame) -> bool:
+        """
+        Parquet exige nomes de coluna str e únicos: abas sem cabeçalho (colunas
+        int) ou com células de cabeçalho vazias repetidas não podem ser gravadas.
+        """
+        cols = list(df.columns)
+        return all(isinstance(c, str) for c in cols) and len(set(cols)) == len(cols)
+
+    def _read_disk_cache(self, sheet_id: str, modified_time: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Abas da planilha gravadas em Parquet para este modifiedTime (ou None).
+        Os arquivos são abertos com memory_map: o SO pagina direto do disco, sem buffer intermediário.
+        """
+        path = self._disk_cache_path(sheet_id, modified_time)
+        if path is None or not (path / "manifest.json").exists():
+            return None
+        try:
+            titles = json.loads((path / "manifest.json").read_text(encoding="utf-8"))["titles"]
+            return {
+                f"{sheet_id}::{title}": pd.read_parquet(path / f"{i}.parquet", memory_map=True)
+                for i, title in enumerate(titles)
+            }
+        except Exception as e:
+            self._last_errors.append(f"Disk cache read error ({sheet_id}): {e}")
+            return None
+
+    def _write_disk_cache(self, sheet_id: str, modified_time: str, frames: Dict[str, pd.DataFrame]) -> None:
+        """
+        Grava as abas de uma planilha (um Parquet por aba + manifest com os títulos)
+        e remove as versões anteriores dessa planilha. Falhas não interrompem a carga.
+        """
+        path = self._disk_cache_path(sheet_id, modified_time)
+        if path is None:
+            return
+        if not all(self._parquet_safe(df) for df in frames.values()):
+            # não é erro: a planilha só fica fora do cache em disco (renomear as
+            # colunas faria o frame lido do disco diferir do baixado da API)
+            return
+        # temporário exclusivo deste writer: sessões gravando a mesma versão ao
+        # mesmo tempo não apagam nem publicam o diretório uma da outra
+        tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            titles = []
+            for i, (key, df) in enumerate(frames.items()):
+                df.to_parquet(tmp / f"{i}.parquet", index=False)
+                titles.append(key.split("::", 1)[1])
+            (tmp / "manifest.json").write_text(
+                json.dumps({"titles": titles}, ensure_ascii=False), encoding="utf-8"
+            )
+            try:
+                tmp.rename(path)
+            except OSError:
+                # outro writer já publicou esta versão: descarta a nossa cópia
+                if not (path / "manifest.json").exists():
+                    raise
+                shutil.rmtree(tmp, ignore_errors=True)
+            stale_tmp = time.time() - DISK_CACHE_TMP_MAX_AGE
+            for old in path.parent.iterdir():
+                if old == path:
+                    continue
+                # temporários de outros writers só saem se abandonados (ex.: processo morto)
+                if ".tmp-" in old.name and old.stat().st_mtime > stale_tmp:
+                    continue
+                shutil.rmtree(old, ignore_errors=True)
+        except Exception as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            self._last_errors.append(f"Disk cache write error ({sheet_id}): {e}")
+
     # -------------------- Carregamento --------------------
 
-    def load_all(self) -> Tuple[int, int]:
+    def load_all(self, force: bool = False) -> Tuple[int, int]:
         """
         Carrega todas as planilhas e abas configuradas.
+        Planilhas cujo modifiedTime no Drive não mudou desde a última carga
+        reaproveitam o cache atual ou, na primeira carga do processo, o cache
+        em Parquet de disk_cache_dir (a menos que force=True).
         Retorna (n_planilhas_lidas, n_linhas_total).
         """
         self._ensure_clients()
 
         prev_cache = self._cache
         new_cache: Dict[str, pd.DataFrame] = {}
+        new_modified: Dict[str, str] = {}
         total_rows = 0
         loaded = 0
 
         try:
             sheet_ids_to_load = self._resolve_sheet_ids()
+            modified = self._fetch_modified_times(sheet_ids_to_load)
+            pending: List[str] = []
 
             for sheet_id in sheet_ids_to_load:
-                try:
-                    # 1) metadados para listar abas
-                    meta = (
-                        self._sheets.spreadsheets()
-                        .get(spreadsheetId=sheet_id)
-                        .execute()
-                    )
-                    sheets = meta.get("sheets", [])
-                    any_loaded = False
-
-                    for sh in sheets:
-                        ws_title = sh["properties"]["title"]
-                        try:
-                            # 2) lê valores da aba no range configurado
-                            rng = f"{ws_title}!{self.sheet_range}"
-                            resp = (
-                                self._sheets.spreadsheets()
-                                .values()
-                                .get(spreadsheetId=sheet_id, range=rng)
-                                .execute()
-                            )
-                            values = resp.get("values", [])
-
-                            if not values:
-                                df = pd.DataFrame()
-                            else:
-                                header = values[0]
-                                rows = values[1:] if len(values) > 1 else []
-                                if all(isinstance(h, str) and len(h) <= 60 for h in header):
-                                    df = pd.DataFrame(rows, columns=header).fillna("")
-                                else:
-                                    df = pd.DataFrame(values).fillna("")
-
-                            if not df.empty:
-                                df["_ws_title"] = ws_title
-
-                            key = f"{sheet_id}::{ws_title}"
-                            new_cache[key] = df
-                            total_rows += len(df)
-                            any_loaded = True
-
-                        except Exception as e:
-                            self._last_errors.append(
-                                f"Worksheet read error ({sheet_id}/{ws_title}): {e}"
-                            )
-                            continue
-
-                    if any_loaded:
+                mt = modified.get(sheet_id)
+                if not force and mt and self._modified_times.get(sheet_id) == mt:
+                    prefix = f"{sheet_id}::"
+                    reused = {k: v for k, v in prev_cache.items() if k.startswith(prefix)}
+                    if reused:
+                        new_cache.update(reused)
+                        new_modified[sheet_id] = mt
+                        total_rows += sum(len(df) for df in reused.values())
                         loaded += 1
-
-                except Exception as e:
-                    self._last_errors.append(f"Spreadsheet open error ({sheet_id}): {e}")
+                        continue
+
+                # mesma versão já baixada antes (ex.: reinício do app): lê do disco
+                cached = self._read_disk_cache(sheet_id, mt) if (mt and not force) else None
+                if cached:
+                    new_cache.update(cached)
+                    new_modified[sheet_id] = mt
+                    total_rows += sum(len(df) for df in cached.values())
+                    loaded += 1
                     continue
 
+                pending.append(sheet_id)
+
+            # planilhas alteradas são baixadas em paralelo (I/O-bound)
+            if pending:
+                if len(pending) == 1:
+                    # uma planilha só: baixa na própria thread, com o cliente principal
+                    results = [self._load_spreadsheet(pending[0])]
+                else:
+                    results = list(_download_executor().map(self._load_spreadsheet, pending))
+                for sheet_id, frames, complete in results:
+                    if not frames:
+                        continue
+                    new_cache.update(frames)
+                    total_rows += sum(len(df) for df in frames.values())
+                    loaded += 1
+                    mt = modified.get(sheet_id)
+                    if mt and complete:
+                        new_modified[sheet_id] = mt
+                        self._write_disk_cache(sheet_id, mt, frames)
+
             self._cache = new_cache
+            self._cache_version += 1
+            self._modified_times = new_modified
+            self._total_rows = total_rows
             return loaded, total_rows
 
         except Exception as e:
@@ -242,6 +579,7 @@ class SheetsLoader:
             "worksheets_count": len(self._cache),
             "resolved_sheet_ids": resolved_ids,
             "loaded": {k: len(v) for k, v in self._cache.items()},
+            "total_rows": self._total_rows,
             "debug": {
                 "auth_source": self._auth_source,
                 "last_errors": self._last_errors[-8:],
@@ -250,6 +588,47 @@ class SheetsLoader:
 
     # -------------------- Busca simples --------------------
 
+    def _id_index(self, key: str) -> Dict[str, np.ndarray]:
+        """
+        Índice hash valor -> posições das linhas, sobre as colunas de ID da aba
+        ("id" no nome, valores como str). Construído uma vez por versão do cache,
+        transforma o match exato de IDs em consultas O(1) a um dict.
+        """
+        if self._id_cols_cache[0] != self._cache_version:
+            self._id_cols_cache = (self._cache_version, {})
+        index = self._id_cols_cache[1].get(key)
+        if index is None:
+            df = self._cache[key]
+            index = {}
+            for c in df.columns:
+                if "id" not in str(c).lower():
+                    continue
+                values = df[c].astype(str).reset_index(drop=True)
+                for value, positions in values.groupby(values, sort=False).indices.items():
+                    prev = index.get(value)
+                    index[value] = positions if prev is None else np.union1d(prev, positions)
+            self._id_cols_cache[1][key] = index
+        return index
+
+    def _search_blob(self, key: str) -> pd.Series:
+        """
+        Linhas da aba como texto único em minúsculas ("v1 | v2 | ...").
+        Montado coluna a coluna (vetorizado) e memoizado pela versão do cache.
+        """
+        if self._blob_cache[0] != self._cache_version:
+            self._blob_cache = (self._cache_version, {})
+        blobs = self._blob_cache[1]
+        blob = blobs.get(key)
+        if blob is None:
+            df = self._cache[key]
+            cols = [df[c].astype(str) for c in df.columns]
+            blob = cols[0]
+            for col in cols[1:]:
+                blob = blob + " | " + col
+            blob = blob.str.lower()
+            blobs[key] = blob
+        return blob
+
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         if not query or not self._cache:
             return []
@@ -260,20 +639,25 @@ class SheetsLoader:
         for key, df in self._cache.items():
             if df.empty:
                 continue
-            concat_series = df.astype(str).apply(
-                lambda r: " | ".join(r.values.tolist()), axis=1
-            ).str.lower()
-
-            idx = concat_series[concat_series.str.contains(q, na=False)].index
-            for i in idx[:top_k]:
-                row = df.iloc[i].to_dict()
-                sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
-                row["_sheet_id"] = sheet_id
-                row["_worksheet"] = ws_title
-                matches.append(row)
+            concat_series = self._search_blob(key)
+
+            idx = concat_series[concat_series.str.contains(q, regex=False, na=False)].index
+            matches.extend(self._tagged_records(key, df.loc[idx[:top_k]]))
+            if len(matches) >= top_k:
+                break
 
         return matches[:top_k]
 
+    @staticmethod
+    def _tagged_records(key: str, rows: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Linhas como dicts (um to_dict para o bloco todo) com _sheet_id/_worksheet."""
+        sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
+        records = rows.to_dict(orient="records")
+        for rec in records:
+            rec["_sheet_id"] = sheet_id
+            rec["_worksheet"] = ws_title
+        return records
+
     def build_context_snippet(self, rows: List[Dict[str, Any]]) -> str:
         if not rows:
             return ""
@@ -286,56 +670,94 @@ class SheetsLoader:
             lines.append(f"{label} {kv}")
         return "\n".join(lines)
 
+    # -------------------- Contexto bruto para o LLM --------------------
+
+    def _context_keys(self, month: Optional[str], year: str) -> List[str]:
+        """Chaves do cache usadas no contexto (todas, ou só as do mês/ano pedido)."""
+        keys = [k for k, df in self._cache.items() if df is not None and not df.empty]
+        if not month:
+            return keys
+        names = [n for n, num in MONTH_ALIASES.items() if num == month]
+        patterns = (f"_{year}_{month}_", f"_{year}-{month}_", f"{year}_{month}")
+        out: List[str] = []
+        for key in keys:
+            kl = key.lower()
+            if any(p in kl for p in patterns) or any(n in kl for n in names):
+                out.append(key)
+        return out
+
+    def build_raw_context(self, question: str, max_chars: Optional[int] = None) -> str:
+        """
+        Linhas das planilhas em JSON (um registro por linha) para o prompt.
+        Se a pergunta cita um mês, usa só as abas desse mês/ano (ano padrão 2024).
+        A saída é gerada linha a linha num buffer; com max_chars, para assim
+        que o limite seria ultrapassado em vez de serializar tudo e truncar.
+        """
+        mmatch = _MONTH_ALIAS_RE.search(question.lower())
+        month = MONTH_ALIASES[mmatch.group(1)] if mmatch else None
+        ymatch = _YEAR_RE.search(question)
+        year = ymatch.group() if ymatch else "2024"
+
+        keys = self._context_keys(month, year)
+        if not keys:
+            return json.dumps(
+                {"aviso": f"Nenhum dado encontrado para o período solicitado (mês {month}, ano {year})"},
+                ensure_ascii=False,
+            )
+
+        buf = io.StringIO()
+        buf.write("[")
+        written = 0
+        sep = "\n"
+        for key in keys:
+            df = self._cache[key]
+            cols = [str(c) for c in df.columns]
+            for row in df.itertuples(index=False, name=None):
+                line = _dump_record(dict(zip(cols, row)))
+                if max_chars is not None and buf.tell() + len(sep) + len(line) + 1 > max_chars:
+                    total = sum(len(self._cache[k]) for k in keys)
+                    buf.write(f"\n]\n... (mais {total - written} linhas omitidas por limite de caracteres)")
+                    return buf.getvalue()
+                buf.write(sep)
+                buf.write(line)
+                sep = ",\n"
+                written += 1
+        buf.write("\n]")
+        return buf.getvalue()
+
     # -------------------- Busca avançada --------------------
 
     def _extract_ids(self, text: str) -> List[str]:
-        patterns = [r"\b[A-Z]-\d{6}-\d{3,6}\b", r"\b[A-Z]-\d{4}-\d{3,6}\b"]
-        found: List[str] = []
-        for pat in patterns:
-            found += re.findall(pat, text)
-        return list(dict.fromkeys(found))
+        return list(dict.fromkeys(_ID_RE.findall(text)))
 
-    def _extract_month_year(self, text: str) -> Optional[Tuple[str, str]]:
-        months = {
-            "janeiro": "01",
-            "fevereiro": "02",
-            "março": "03",
-            "marco": "03",
-            "abril": "04",
-            "maio": "05",
-            "junho": "06",
-            "julho": "07",
-            "agosto": "08",
-            "setembro": "09",
-            "outubro": "10",
-            "novembro": "11",
-            "dezembro": "12",
-        }
-        t = text.lower()
-        year = None
-        mnum = None
-        for name, num in months.items():
-            if name in t:
-                mnum = num
+    @staticmethod
+    def _scan_month_year(text: str) -> Tuple[Optional[str], Optional[str]]:
+        """(mês, ano) citados no texto, numa única varredura com regex pré-compilada."""
+        month: Optional[str] = None
+        year: Optional[str] = None
+        for m in _MONTH_YEAR_RE.finditer(text.lower()):
+            if m.lastgroup == "month":
+                month = month or MONTH_NUMBERS[m.group("month")]
+            else:
+                year = year or m.group("year")
+            if month and year:
                 break
-        ymatch = re.search(r"\b(20\d{2})\b", t)
-        if ymatch:
-            year = ymatch.group(1)
+        return month, year
+
+    def _extract_month_year(self, text: str) -> Optional[Tuple[str, str]]:
+        mnum, year = self._scan_month_year(text)
         if mnum and year:
             return year, mnum
         return None
 
     def infer_year_for_month(self, month_num: str) -> Optional[str]:
-        pat = re.compile(r"_(20\d{2})_" + re.escape(month_num) + r"_")
-        for key in self._cache.keys():
-            m = pat.search(key)
-            if m:
-                return m.group(1)
+        for year, mnum in self._period_index():
+            if mnum == month_num:
+                return year
 
         years = set()
-        year_pat = re.compile(r"_(20\d{2})_")
         for key in self._cache.keys():
-            m = year_pat.search(key)
+            m = _KEY_YEAR_RE.search(key)
             if m:
                 years.add(m.group(1))
         if len(years) == 1:
@@ -343,31 +765,11 @@ class SheetsLoader:
         return "2024"
 
     def parse_month_year(self, text: str) -> Optional[Tuple[str, str]]:
-        ym = self._extract_month_year(text)
-        if ym:
-            return ym
-        months = {
-            "janeiro": "01",
-            "fevereiro": "02",
-            "março": "03",
-            "marco": "03",
-            "abril": "04",
-            "maio": "05",
-            "junho": "06",
-            "julho": "07",
-            "agosto": "08",
-            "setembro": "09",
-            "outubro": "10",
-            "novembro": "11",
-            "dezembro": "12",
-        }
-        t = text.lower()
-        for name, num in months.items():
-            if name in t:
-                year = self.infer_year_for_month(num)
-                if year:
-                    return year, num
-        return None
+        mnum, year = self._scan_month_year(text)
+        if not mnum:
+            return None
+        year = year or self.infer_year_for_month(mnum)
+        return (year, mnum) if year else None
 
     def search_advanced(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         if not query or not self._cache:
@@ -376,14 +778,8 @@ class SheetsLoader:
         ids = self._extract_ids(query)
         ym = self._extract_month_year(query)
 
-        filtered_keys = list(self._cache.keys())
-        if ym:
-            year, month = ym
-            token = f"_{year}_{month}_"
-            filtered_keys = [
-                k for k in filtered_keys
-                if token in k or token in str(self._cache[k].get("_ws_title", ""))
-            ]
+        # período citado: só as abas dele, direto do índice (sem varrer as chaves)
+        filtered_keys = list(self._period_index().get(ym, [])) if ym else list(self._cache.keys())
 
         results: List[Dict[str, Any]] = []
 
@@ -393,30 +789,22 @@ class SheetsLoader:
                 df = self._cache[key]
                 if df.empty:
                     continue
-                for idv in ids:
-                    id_cols = [c for c in df.columns if "id" in str(c).lower()]
-                    matched = pd.DataFrame()
-                    for col in id_cols:
-                        try:
-                            matched = pd.concat([matched, df[df[col].astype(str) == idv]])
-                        except Exception:
-                            continue
-                    if matched.empty:
-                        concat_series = df.astype(str).apply(
-                            lambda r: " | ".join(r.values.tolist()), axis=1
-                        ).str.lower()
-                        idx = concat_series[concat_series.str.contains(idv.lower(), na=False)].index
-                        if len(idx) > 0:
-                            matched = df.loc[idx]
-
-                    for _, row in matched.head(top_k).iterrows():
-                        rec = row.to_dict()
-                        sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
-                        rec["_sheet_id"] = sheet_id
-                        rec["_worksheet"] = ws_title
-                        results.append(rec)
-                        if len(results) >= top_k:
-                            return results
+                # match exato: consulta ao índice hash das colunas de ID
+                mask = np.zeros(len(df), dtype=bool)
+                id_index = self._id_index(key)
+                found = {idv for idv in ids if idv in id_index}
+                for idv in found:
+                    mask[id_index[idv]] = True
+                # IDs sem match exato: procura como substring no texto da linha
+                missing = [idv for idv in ids if idv not in found]
+                if missing:
+                    concat_series = self._search_blob(key)
+                    for idv in missing:
+                        mask |= concat_series.str.contains(idv.lower(), regex=False, na=False).to_numpy()
+
+                results.extend(self._tagged_records(key, df[mask].head(top_k)))
+                if len(results) >= top_k:
+                    return results[:top_k]
 
         # 2) tokens
         tokens = [w.strip(".,:;!?()[]{}\"'`").lower() for w in query.split()]
@@ -426,26 +814,22 @@ class SheetsLoader:
             df = self._cache[key]
             if df.empty:
                 continue
-            concat_series = df.astype(str).apply(
-                lambda r: " | ".join(r.values.tolist()), axis=1
-            ).str.lower()
+            concat_series = self._search_blob(key)
 
             if tokens:
-                mask = pd.Series(True, index=concat_series.index)
+                # cada token só é procurado nas linhas que já casaram com os anteriores
+                cand = concat_series
                 for t in tokens[:5]:
-                    mask = mask & concat_series.str.contains(t, na=False)
-                idx = concat_series[mask].index
+                    cand = cand[cand.str.contains(t, regex=False, na=False)]
+                    if cand.empty:
+                        break
+                idx = cand.index
             else:
                 idx = []
 
-            for i in idx[:top_k]:
-                row = df.iloc[i].to_dict()
-                sheet_id, ws_title = (key.split("::", 1) + [""])[:2]
-                row["_sheet_id"] = sheet_id
-                row["_worksheet"] = ws_title
-                results.append(row)
-                if len(results) >= top_k:
-                    return results
+            results.extend(self._tagged_records(key, df.loc[idx[:top_k]]))
+            if len(results) >= top_k:
+                return results[:top_k]
 
         return results[:top_k]
 
@@ -463,51 +847,83 @@ class SheetsLoader:
             return float(s)
         except Exception:
             try:
-                import re as _re
-                return float(_re.sub(r"[^0-9\.-]", "", s))
+                return float(_NON_NUMERIC_RE.sub("", s))
             except Exception:
                 return 0.0
 
+    @staticmethod
+    def _month_num(month_name_or_num: str) -> Optional[str]:
+        """Número do mês ("01".."12") a partir do nome ou número; None se inválido."""
+        m = month_name_or_num.strip().lower()
+        if m in MONTH_NUMBERS:
+            return MONTH_NUMBERS[m]
+        if _MONTH_NUM_RE.fullmatch(m):
+            return m.zfill(2)
+        for name, num in MONTH_NUMBERS.items():
+            if name in m:
+                return num
+        return None
+
+    @staticmethod
+    def _parse_number_br_series(values: pd.Series) -> pd.Series:
+        """
+        Versão vetorizada de _parse_number_br para uma coluna inteira:
+        uma passada de str.translate ("R$", espaços e "." somem, "," vira ".")
+        + to_numeric; só os valores que não convertem passam pela limpeza por regex.
+        """
+        clean = values.astype(str).str.strip().str.translate(_BR_NUMBER_TABLE)
+        out = pd.to_numeric(clean, errors="coerce")
+        retry = out.isna() & clean.ne("")
+        if retry.any():
+            out[retry] = pd.to_numeric(
+                clean[retry].str.replace(_NON_NUMERIC_RE, "", regex=True), errors="coerce"
+            )
+        return out.fillna(0.0).astype(float)
+
     def month_token(self, year: str, month_num: str) -> str:
         return f"_{year}_{month_num}_"
 
+    def _period_index(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Índice (ano, mês) -> chaves do cache com esse período.
+        Memoizado pela versão do cache: só é reconstruído após um novo load_all.
+        """
+        if self._period_cache[0] != self._cache_version:
+            index: Dict[Tuple[str, str], List[str]] = {}
+            for key, df in self._cache.items():
+                period = self._period_of(key, df)
+                if period:
+                    index.setdefault(period, []).append(key)
+            self._period_cache = (self._cache_version, index)
+        return self._period_cache[1]
+
     def get_month_dataframe(self, year: str, month_num: str) -> pd.DataFrame:
-        token = self.month_token(year, month_num)
-        frames = []
-        for key, df in self._cache.items():
-            if token in key or token in str(df.get("_ws_title", "")):
-                if not df.empty:
-                    frames.append(df.copy())
-        if not frames:
-            return pd.DataFrame()
-        return pd.concat(frames, ignore_index=True)
+        """
+        Abas do mês/ano concatenadas. Memoizado por período e versão do cache:
+        consultas repetidas ao mesmo mês (totais, top produtos) não refazem o concat.
+        O resultado é compartilhado entre chamadas: não deve ser alterado.
+        """
+        period = (str(year), str(month_num))
+        if self._month_frames[0] != self._cache_version:
+            self._month_frames = (self._cache_version, {})
+        memo = self._month_frames[1]
+        if period not in memo:
+            keys = self._period_index().get(period, [])
+            frames = [self._cache[k] for k in keys if not self._cache[k].empty]
+            if len(frames) == 1:
+                memo[period] = frames[0]  # uma aba só: usa o próprio DataFrame, sem concat
+            else:
+                memo[period] = pd.concat(frames, ignore_index=True, copy=False) if frames else pd.DataFrame()
+        return memo[period]
     
     def get_month_totals(self, month_name_or_num: str, year: str) -> Dict[str, Any]:
         """
         Calcula totais gerais para um mês específico (receita, quantidade, pedidos).
         Retorna dados agregados completos, não apenas top produtos.
         """
-        months = {
-            "01": "janeiro", "02": "fevereiro", "03": "março", "04": "abril", 
-            "05": "maio", "06": "junho", "07": "julho", "08": "agosto", 
-            "09": "setembro", "10": "outubro", "11": "novembro", "12": "dezembro"
-        }
-        inv = {v: k for k, v in months.items()}
-        m = month_name_or_num.strip().lower()
-        
-        # Identifica número do mês
-        if m in inv:
-            month_num = inv[m]
-        elif re.fullmatch(r"\d{1,2}", m):
-            month_num = m.zfill(2)
-        else:
-            month_num = None
-            for name, num in inv.items():
-                if name in m:
-                    month_num = num
-                    break
-            if month_num is None:
-                return {"found": False, "reason": "Mês inválido"}
+        month_num = self._month_num(month_name_or_num)
+        if month_num is None:
+            return {"found": False, "reason": "Mês inválido"}
         
         df = self.get_month_dataframe(year, month_num)
         if df.empty:
@@ -517,8 +933,13 @@ class SheetsLoader:
         receita_total = 0.0
         quantidade_total = 0.0
         
-        if "Receita_Total" in df.columns:
-            receita_total = df["Receita_Total"].apply(self._parse_number_br).sum()
+        receita = (
+            self._parse_number_br_series(df["Receita_Total"])
+            if "Receita_Total" in df.columns
+            else None
+        )
+        if receita is not None:
+            receita_total = float(receita.sum())
         
         if "Quantidade" in df.columns:
             quantidade_total = pd.to_numeric(df["Quantidade"], errors="coerce").fillna(0).sum()
@@ -527,20 +948,19 @@ class SheetsLoader:
         
         # Top 5 produtos por receita (resumo)
         top_produtos = []
-        if "Produto" in df.columns and "Receita_Total" in df.columns:
+        if "Produto" in df.columns and receita is not None:
             tmp = pd.DataFrame({
-                "Produto": df["Produto"],
-                "Receita_Total": df["Receita_Total"].apply(self._parse_number_br)
+                "Produto": df["Produto"].astype("category"),
+                "Receita_Total": receita
             })
-            top = tmp.groupby("Produto", as_index=False)["Receita_Total"].sum()\
-                     .sort_values(by="Receita_Total", ascending=False)\
-                     .head(5)
+            top = tmp.groupby("Produto", as_index=False, observed=True)["Receita_Total"].sum()\
+                     .nlargest(5, "Receita_Total")
             top_produtos = top.to_dict(orient="records")
         
         return {
             "found": True,
             "year": year,
-            "month": months.get(month_num, month_num),
+            "month": MONTH_NAMES.get(month_num, month_num),
             "month_num": month_num,
             "receita_total": round(receita_total, 2),
             "quantidade_total": int(quantidade_total),
@@ -549,24 +969,9 @@ class SheetsLoader:
         }
 
     def top_products(self, month_name_or_num: str, year: str, top_n: int = 3) -> Dict[str, Any]:
-        months = {
-            "01": "janeiro", "02": "fevereiro", "03": "março", "04": "abril", "05": "maio", "06": "junho",
-            "07": "julho", "08": "agosto", "09": "setembro", "10": "outubro", "11": "novembro", "12": "dezembro"
-        }
-        inv = {v: k for k, v in months.items()}
-        m = month_name_or_num.strip().lower()
-        if m in inv:
-            month_num = inv[m]
-        elif re.fullmatch(r"\d{1,2}", m):
-            month_num = m.zfill(2)
-        else:
-            month_num = None
-            for name, num in inv.items():
-                if name in m:
-                    month_num = num
-                    break
-            if month_num is None:
-                return {"found": False, "reason": "Mês inválido"}
+        month_num = self._month_num(month_name_or_num)
+        if month_num is None:
+            return {"found": False, "reason": "Mês inválido"}
 
         df = self.get_month_dataframe(year, month_num)
         if df.empty or "Produto" not in df.columns:
@@ -574,29 +979,22 @@ class SheetsLoader:
 
         q = pd.to_numeric(df.get("Quantidade", 0), errors="coerce").fillna(0).astype(float)
         r = (
-            df.get("Receita_Total", 0).apply(self._parse_number_br)
+            self._parse_number_br_series(df["Receita_Total"])
             if "Receita_Total" in df.columns
             else pd.Series([0] * len(df))
         )
-        tmp = pd.DataFrame({"Produto": df["Produto"], "Quantidade": q, "Receita_Total": r})
+        # produto categórico: o groupby agrupa por códigos inteiros, sem hash de str
+        tmp = pd.DataFrame({"Produto": df["Produto"].astype("category"), "Quantidade": q, "Receita_Total": r})
 
-        by_qty = (
-            tmp.groupby("Produto", as_index=False)["Quantidade"]
-            .sum()
-            .sort_values(by="Quantidade", ascending=False)
-            .head(top_n)
-        )
-        by_rev = (
-            tmp.groupby("Produto", as_index=False)["Receita_Total"]
-            .sum()
-            .sort_values(by="Receita_Total", ascending=False)
-            .head(top_n)
-        )
+        # uma agregação para as duas métricas; nlargest evita ordenar todos os produtos
+        sums = tmp.groupby("Produto", as_index=False, observed=True)[["Quantidade", "Receita_Total"]].sum()
+        by_qty = sums.nlargest(top_n, "Quantidade")[["Produto", "Quantidade"]]
+        by_rev = sums.nlargest(top_n, "Receita_Total")[["Produto", "Receita_Total"]]
 
         return {
             "found": True,
             "year": year,
-            "month": months.get(month_num, month_num),
+            "month": MONTH_NAMES.get(month_num, month_num),
             "top_n": top_n,
             "by_quantity": by_qty.to_dict(orient="records"),
             "by_revenue": by_rev.to_dict(orient="records"),
@@ -604,81 +1002,137 @@ class SheetsLoader:
 
     # -------------------- Agregações globais --------------------
 
-    def _detect_month_tokens(self) -> List[Tuple[str, str]]:
-        pat = re.compile(r"_(20\d{2})_(\d{2})_")
-        found: List[Tuple[str, str]] = []
-        for key, df in self._cache.items():
-            m = pat.search(key)
-            if m:
-                found.append((m.group(1), m.group(2)))
-                continue
-            title = str(df.get("_ws_title", ""))
-            m2 = pat.search(title)
-            if m2:
-                found.append((m2.group(1), m2.group(2)))
-        unique = list(dict.fromkeys(found))
-        unique.sort()
-        return unique
+    @staticmethod
+    def _period_of(key: str, df: pd.DataFrame) -> Optional[Tuple[str, str]]:
+        """(ano, mês) do token _AAAA_MM_ na chave (ou no título da aba)."""
+        m = _PERIOD_RE.search(key) or _PERIOD_RE.search(str(df.get("_ws_title", "")))
+        return (m.group(1), m.group(2)) if m else None
 
-    def top_products_by_month_all(self, top_n: int = 3) -> Dict[str, Any]:
-        months_names = {
-            "01": "janeiro", "02": "fevereiro", "03": "março", "04": "abril", "05": "maio", "06": "junho",
-            "07": "julho", "08": "agosto", "09": "setembro", "10": "outubro", "11": "novembro", "12": "dezembro"
-        }
-        tokens = self._detect_month_tokens()
-        results: List[Dict[str, Any]] = []
-        for year, month_num in tokens:
-            df = self.get_month_dataframe(year, month_num)
-            if df.empty or "Produto" not in df.columns:
-                continue
-            q = pd.to_numeric(df.get("Quantidade", 0), errors="coerce").fillna(0).astype(float)
-            tmp = pd.DataFrame({"Produto": df["Produto"], "Quantidade": q})
-            by_qty = (
-                tmp.groupby("Produto", as_index=False)["Quantidade"]
+    def _monthly_product_totals(self) -> pd.DataFrame:
+        """
+        Quantidade por (ano, mês, produto) de todas as abas com período no nome,
+        ordenada por período e quantidade decrescente.
+        Memoizado pela versão do cache: cada consulta só faz o head(top_n) por mês.
+        """
+        if self._monthly_totals[0] == self._cache_version:
+            return self._monthly_totals[1]
+
+        parts: List[pd.DataFrame] = []
+        for period, keys in self._period_index().items():
+            for key in keys:
+                df = self._cache[key]
+                if df.empty or "Produto" not in df.columns:
+                    continue
+                q = pd.to_numeric(df["Quantidade"], errors="coerce") if "Quantidade" in df.columns else 0.0
+                parts.append(pd.DataFrame({
+                    "year": period[0],
+                    "month_num": period[1],
+                    "Produto": df["Produto"],
+                    "Quantidade": q,
+                }))
+        if not parts:
+            agg = pd.DataFrame()
+        else:
+            # Uma única agregação (ano, mês, produto) em vez de um groupby por mês
+            all_df = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True, copy=False)
+            all_df["Quantidade"] = all_df["Quantidade"].fillna(0).astype(float)
+            for col in ("year", "month_num", "Produto"):
+                all_df[col] = all_df[col].astype("category")
+            agg = (
+                all_df.groupby(["year", "month_num", "Produto"], as_index=False, observed=True)["Quantidade"]
                 .sum()
-                .sort_values(by="Quantidade", ascending=False)
-                .head(top_n)
+                .sort_values(["year", "month_num", "Quantidade"], ascending=[True, True, False])
             )
+        self._monthly_totals = (self._cache_version, agg)
+        return agg
+
+    def top_products_by_month_all(self, top_n: int = 3) -> Dict[str, Any]:
+        agg = self._monthly_product_totals()
+        if agg.empty:
+            return {"found": False, "months": [], "top_n": top_n}
+
+        top = agg.groupby(["year", "month_num"], sort=False, observed=True).head(top_n)
+
+        results: List[Dict[str, Any]] = []
+        for (year, month_num), grp in top.groupby(["year", "month_num"], sort=False, observed=True):
             results.append({
                 "year": year,
-                "month": months_names.get(month_num, month_num),
+                "month": MONTH_NAMES.get(month_num, month_num),
                 "top_n": top_n,
-                "by_quantity": by_qty.to_dict(orient="records"),
+                "by_quantity": grp[["Produto", "Quantidade"]].to_dict(orient="records"),
             })
         return {"found": bool(results), "months": results, "top_n": top_n}
 
+    _PRODUCT_COLS = ("Produto", "Quantidade", "Data")
+
+    def _concat_products(self) -> pd.DataFrame:
+        """
+        Concatena as colunas Produto/Quantidade/Data de todas as abas com
+        coluna Produto (Produto categórico, Quantidade já numérica).
+        Memoizado pela versão do cache: só refaz o concat após um novo load_all.
+        """
+        if self._concat_cache[0] != self._cache_version:
+            # só as colunas usadas nas agregações: não empilha o resto das abas
+            frames = [
+                df[[c for c in self._PRODUCT_COLS if c in df.columns]]
+                for df in self._cache.values()
+                if not df.empty and "Produto" in df.columns
+            ]
+            all_df = pd.concat(frames, ignore_index=True, copy=False) if frames else pd.DataFrame()
+            if not all_df.empty:
+                # Produto como category: groupby por códigos inteiros, não por strings
+                all_df["Produto"] = all_df["Produto"].astype("category")
+                if "Quantidade" in all_df.columns:
+                    all_df["Quantidade"] = pd.to_numeric(all_df["Quantidade"], errors="coerce").fillna(0).astype(float)
+            self._concat_cache = (self._cache_version, all_df)
+        return self._concat_cache[1]
+
+    @staticmethod
+    def _parse_dates_br(values: pd.Series) -> pd.Series:
+        """
+        Converte datas tentando primeiro formatos fixos (parser vetorizado do
+        pandas) e só usa a inferência dayfirst nos valores que sobrarem.
+        Cada data distinta é convertida uma única vez (vendas repetem muito a data).
+        """
+        codes, uniques = pd.factorize(values.astype(str).str.strip())
+        raw = pd.Series(uniques, dtype=object)
+        dt = pd.to_datetime(raw, format=_DATE_FORMATS[0], errors="coerce")
+        for fmt in _DATE_FORMATS[1:]:
+            rest = dt.isna() & raw.ne("")
+            if not rest.any():
+                break
+            dt[rest] = pd.to_datetime(raw[rest], format=fmt, errors="coerce")
+        else:
+            rest = dt.isna() & raw.ne("")
+            if rest.any():
+                dt[rest] = pd.to_datetime(raw[rest], format="mixed", dayfirst=True, errors="coerce")
+        return pd.Series(dt.to_numpy()[codes], index=values.index)
+
     def _top_products_by_month_via_date(self, top_n: int = 3) -> Dict[str, Any]:
-        months_names = {
-            1: "janeiro", 2: "fevereiro", 3: "março", 4: "abril", 5: "maio", 6: "junho",
-            7: "julho", 8: "agosto", 9: "setembro", 10: "outubro", 11: "novembro", 12: "dezembro"
-        }
-        frames = [df for df in self._cache.values() if not df.empty and "Produto" in df.columns]
-        if not frames:
-            return {"found": False}
-        all_df = pd.concat(frames, ignore_index=True)
-        if "Data" not in all_df.columns:
+        all_df = self._concat_products()
+        if all_df.empty or "Data" not in all_df.columns:
             return {"found": False}
-        dt = pd.to_datetime(all_df["Data"], errors="coerce", dayfirst=True, infer_datetime_format=True)
+        dt = self._parse_dates_br(all_df["Data"])
         qty = pd.to_numeric(all_df.get("Quantidade", 0), errors="coerce").fillna(0).astype(float)
         safe = pd.DataFrame({"Produto": all_df.get("Produto"), "Quantidade": qty, "ano": dt.dt.year, "mes": dt.dt.month})
         safe = safe.dropna(subset=["ano", "mes"])
         if safe.empty:
             return {"found": False}
+        # Uma agregação (ano, mês, produto) + head por mês, em vez de um groupby por mês
+        agg = safe.groupby(["ano", "mes", "Produto"], as_index=False, observed=True)["Quantidade"].sum()
+        top = (
+            agg.sort_values(["ano", "mes", "Quantidade"], ascending=[True, True, False])
+            .groupby(["ano", "mes"], sort=False)
+            .head(top_n)
+        )
         results: List[Dict[str, Any]] = []
-        for (year, month), grp in safe.groupby(["ano", "mes"]):
-            by_qty = (
-                grp.groupby("Produto", as_index=False)["Quantidade"]
-                .sum()
-                .sort_values(by="Quantidade", ascending=False)
-                .head(top_n)
-            )
+        for (year, month), grp in top.groupby(["ano", "mes"], sort=True):
             results.append({
                 "year": int(year),
-                "month": months_names.get(int(month), str(month)).lower(),
+                "month": MONTH_NAMES.get(f"{int(month):02d}", str(month)),
                 "top_n": top_n,
-                "by_quantity": by_qty.to_dict(orient="records"),
+                "by_quantity": grp[["Produto", "Quantidade"]].to_dict(orient="records"),
             })
-        results.sort(key=lambda x: (x["year"], x["month"]))
         return {"found": bool(results), "months": results, "top_n": top_n}
 
     # -------------------- Preview / resumo --------------------
@@ -697,16 +1151,15 @@ class SheetsLoader:
         return out
 
     def base_summary(self, top_n: int = 3) -> Dict[str, Any]:
-        status = self.status()
-        loaded_map = status.get("loaded", {}) or {}
-        total_rows = sum(int(v) for v in loaded_map.values()) if loaded_map else 0
+        # só precisa do que já está em memória: status() listaria a pasta no Drive de novo
+        total_rows = int(self._total_rows)
         schema = self.schema_preview()
         res = self.top_products_by_month_all(top_n=top_n)
         if not res.get("found"):
             res = self._top_products_by_month_via_date(top_n=top_n)
         return {
             "found": True,
-            "totals": {"worksheets": len(loaded_map), "rows": total_rows},
+            "totals": {"worksheets": len(self._cache), "rows": total_rows},
             "schema": schema,
             "top_by_month": res if res.get("found") else {"found": False},
         }
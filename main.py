@@ -172,8 +172,7 @@ def main() -> None:
                 status = loader.status()
                 worksheets_count = status.get("worksheets_count", 0)
                 sheets_count = status.get("sheets_count", 0)
-                loaded_map = status.get("loaded", {}) or {}
-                rows_total = sum(int(v) for v in loaded_map.values()) if loaded_map else 0
+                rows_total = int(status.get("total_rows", 0))
             except Exception:
                 pass
 
@@ -224,7 +223,8 @@ def main() -> None:
         # Botão para recarregar planilhas manualmente
         if loader and st.button("Recarregar planilhas agora"):
             try:
-                n_sheets, n_rows = loader.load_all()
+                # força o download: fórmulas (IMPORTRANGE, NOW()...) mudam sem alterar o modifiedTime
+                n_sheets, n_rows = loader.load_all(force=True)
                 st.session_state.sheets_status = {"sheets": n_sheets, "rows": n_rows}
                 st.session_state.sheets_last_loaded = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 st.session_state.sheets_last_loaded_ts = time.time()
@@ -334,7 +334,7 @@ def main() -> None:
                     ],
                     "totals": {
                         "worksheets": len(loaded_map),
-                        "rows": sum(int(v) for v in loaded_map.values()) if loaded_map else 0,
+                        "rows": int(status.get("total_rows", 0)),
                     },
                     "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 }
@@ -417,91 +417,7 @@ def main() -> None:
         loader = st.session_state.get("sheets")
         
         if loader and hasattr(loader, '_cache') and loader._cache:
-            # ===== FILTRO INTELIGENTE POR MÊS =====
-            text_lower = last_user_msg.lower()
-            
-            # DEBUG: Mostra o que tem carregado
-            print(f"📊 DEBUG - Planilhas disponíveis:")
-            for key in loader._cache.keys():
-                print(f"  - {key}")
-            
-            # Detecta mês na pergunta
-            meses = {
-                'janeiro': '01', 'jan': '01',
-                'fevereiro': '02', 'fev': '02',
-                'março': '03', 'mar': '03',
-                'abril': '04', 'abr': '04',
-                'maio': '05', 'mai': '05',
-                'junho': '06', 'jun': '06',
-                'julho': '07', 'jul': '07',
-                'agosto': '08', 'ago': '08',
-                'setembro': '09', 'set': '09',
-                'outubro': '10', 'out': '10',
-                'novembro': '11', 'nov': '11',
-                'dezembro': '12', 'dez': '12'
-            }
-            
-            mes_filtro = None
-            ano_filtro = None
-            
-            # Busca mês
-            for nome_mes, num_mes in meses.items():
-                if nome_mes in text_lower:
-                    mes_filtro = num_mes
-                    break
-            
-            # Busca ano (2024, 2023, etc)
-            import re
-            ano_match = re.search(r'20\d{2}', last_user_msg)
-            if ano_match:
-                ano_filtro = ano_match.group()
-            else:
-                ano_filtro = "2024"  # Padrão
-            
-            print(f"🔍 DEBUG - Filtro detectado: mês={mes_filtro}, ano={ano_filtro}")
-            
-            # Coleta dados filtrados ou todos
-            all_data = []
-            
-            for sheet_key, df in loader._cache.items():
-                if df is not None and not df.empty:
-                    # Se detectou mês, filtra de forma FLEXÍVEL
-                    if mes_filtro and ano_filtro:
-                        # Tenta vários padrões de match:
-                        # 1. _2024_01_
-                        # 2. janeiro
-                        # 3. _01_
-                        # 4. _2024_janeiro_
-                        # 5. _2024-01_ (hífen)
-                        
-                        key_lower = sheet_key.lower()
-                        matches = (
-                            f"_{ano_filtro}_{mes_filtro}_" in key_lower or
-                            f"_{ano_filtro}-{mes_filtro}_" in key_lower or
-                            f"_{ano_filtro}_{mes_filtro}" in key_lower or
-                            f"{ano_filtro}_{mes_filtro}" in key_lower or
-                            any(nome in key_lower for nome, num in meses.items() if num == mes_filtro)
-                        )
-                        
-                        if matches:
-                            print(f"✅ DEBUG - Match encontrado: {sheet_key} ({len(df)} linhas)")
-                            # Pega TODAS as linhas da planilha do mês específico
-                            all_data.extend(df.to_dict(orient='records'))
-                        else:
-                            print(f"❌ DEBUG - Ignorado: {sheet_key}")
-                    else:
-                        # Sem filtro: TODAS as linhas de TODAS as planilhas
-                        print(f"📂 DEBUG - Adicionando planilha completa: {sheet_key} ({len(df)} linhas)")
-                        all_data.extend(df.to_dict(orient='records'))
-            
-            # SEM LIMITE - envia TODOS os dados do mês filtrado
-            # (o filtro por mês já garante que não vai explodir)
-            
-            if all_data:
-                sheets_ctx = json.dumps(all_data, ensure_ascii=False, indent=2)
-            else:
-                sheets_ctx = json.dumps({"aviso": f"Nenhum dado encontrado para o período solicitado (mês {mes_filtro}, ano {ano_filtro})"}, ensure_ascii=False)
-
+            sheets_ctx = loader.build_raw_context(last_user_msg)
 
         # Monta prompt final
         if sheets_ctx: